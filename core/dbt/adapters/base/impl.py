@@ -690,8 +690,8 @@ class BaseAdapter(metaclass=AdapterMeta):
             information_schema, schema
         )
 
-        logger.debug('with database={}, schema={}, relations={}'
-                     .format(database, schema, relations))
+        logger.debug('with database={}, schema={}, relations={}',
+                     database, schema, relations)
         return relations
 
     def _make_match_kwargs(
@@ -45,6 +45,10 @@ class SourceConfig:
         adapter_type = active_project.credentials.type
         adapter_class = get_adapter_class_by_name(adapter_type)
         self.AdapterSpecificConfigs = adapter_class.AdapterSpecificConfigs
+        # these are checked for every key of every merged config, so build
+        # the combined sets once instead of on each membership test
+        self._clobber_keys = self.ClobberFields | self.AdapterSpecificConfigs
+        self._config_keys = self.ConfigKeys | self.AdapterSpecificConfigs
 
         # the config options defined within the model
         self.in_model_config: Dict[str, Any] = {}
@@ -56,7 +60,7 @@ class SourceConfig:
             config = config.copy()
             clobber = {
                 key: config.pop(key) for key in list(config.keys())
-                if key in (self.ClobberFields | self.AdapterSpecificConfigs)
+                if key in self._clobber_keys
             }
             intermediary_merged = deep_merge(
                 merged_config, config
@@ -143,11 +147,9 @@ class SourceConfig:
         return items
 
     def smart_update(self, mutable_config, new_configs):
-        config_keys = self.ConfigKeys | self.AdapterSpecificConfigs
-
         relevant_configs: Dict[str, Any] = {
             key: new_configs[key] for key
-            in new_configs if key in config_keys
+            in new_configs if key in self._config_keys
         }
 
         for key in self.AppendListFields:
@@ -165,7 +167,7 @@ class SourceConfig:
                     'Invalid config field: "{}" must be a dict'.format(key)
                 )
 
-        for key in (self.ClobberFields | self.AdapterSpecificConfigs):
+        for key in self._clobber_keys:
             if key in relevant_configs:
                 mutable_config[key] = relevant_configs[key]
 
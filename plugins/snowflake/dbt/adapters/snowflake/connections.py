@@ -6,11 +6,6 @@ from dataclasses import dataclass
 from io import StringIO
 from typing import Optional
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import serialization
-import snowflake.connector
-import snowflake.connector.errors
-
 import dbt.exceptions
 from dbt.adapters.base import Credentials
 from dbt.adapters.sql import SQLConnectionManager
@@ -29,6 +24,9 @@ class SnowflakeCredentials(Credentials):
     private_key_passphrase: Optional[str]
     token: Optional[str]
     client_session_keep_alive: bool = False
+    # look up relation columns with `show columns` rather than by querying
+    # information_schema
+    show_columns: bool = False
 
     @property
     def type(self):
@@ -56,6 +54,9 @@ class SnowflakeCredentials(Credentials):
         if not self.private_key_path or self.private_key_passphrase is None:
             return None
 
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import serialization
+
         with open(self.private_key_path, 'rb') as key:
             p_key = serialization.load_pem_private_key(
                 key.read(),
@@ -73,12 +74,17 @@ class SnowflakeConnectionManager(SQLConnectionManager):
 
     @contextmanager
     def exception_handler(self, sql):
+        # the snowflake connector is slow to import and many dbt commands
+        # never open a connection, so it's imported where it's used rather
+        # than when the plugin is loaded
+        import snowflake.connector.errors
+
         try:
             yield
         except snowflake.connector.errors.ProgrammingError as e:
             msg = str(e)
 
-            logger.debug('Snowflake error: {}'.format(msg))
+            logger.debug('Snowflake error: {}', msg)
 
             if 'Empty SQL statement' in msg:
                 logger.debug("got empty sql statement, moving on")
@@ -110,6 +116,8 @@ class SnowflakeConnectionManager(SQLConnectionManager):
             logger.debug('Connection is already open, skipping open.')
             return connection
 
+        import snowflake.connector
+
         try:
             creds = connection.credentials
 
@@ -130,8 +138,7 @@ class SnowflakeConnectionManager(SQLConnectionManager):
             connection.state = 'open'
         except snowflake.connector.errors.Error as e:
             logger.debug("Got an error when attempting to open a snowflake "
-                         "connection: '{}'"
-                         .format(e))
+                         "connection: '{}'", e)
 
             connection.handle = None
             connection.state = 'fail'
@@ -146,12 +153,12 @@ class SnowflakeConnectionManager(SQLConnectionManager):
 
         sql = 'select system$abort_session({})'.format(sid)
 
-        logger.debug("Cancelling query '{}' ({})".format(connection_name, sid))
+        logger.debug("Cancelling query '{}' ({})", connection_name, sid)
 
         _, cursor = self.add_query(sql)
         res = cursor.fetchone()
 
-        logger.debug("Cancel query '{}': {}".format(connection_name, res))
+        logger.debug("Cancel query '{}': {}", connection_name, res)
 
     @classmethod
     def get_status(cls, cursor):
@@ -165,10 +172,11 @@ class SnowflakeConnectionManager(SQLConnectionManager):
     @classmethod
     def _split_queries(cls, sql):
         "Splits sql statements at semicolons into discrete queries"
+        from snowflake.connector.util_text import split_statements
 
         sql_s = str(sql)
         sql_buf = StringIO(sql_s)
-        split_query = snowflake.connector.util_text.split_statements(sql_buf)
+        split_query = split_statements(sql_buf)
         return [part[0] for part in split_query]
 
     @classmethod
@@ -243,6 +251,8 @@ class SnowflakeConnectionManager(SQLConnectionManager):
         """On snowflake, rolling back the handle of an aborted session raises
         an exception.
         """
+        import snowflake.connector.errors
+
         logger.debug('initiating rollback')
         try:
             connection.handle.rollback()
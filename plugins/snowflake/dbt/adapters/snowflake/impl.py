@@ -1,14 +1,43 @@
-from typing import Mapping, Any, Optional
+import json
+import threading
+from collections import OrderedDict
+from typing import Mapping, Any, Optional, List, Dict, Tuple
 
 import agate
 
+import dbt.flags
+from dbt.adapters.base.meta import available
 from dbt.adapters.sql import SQLAdapter
 from dbt.adapters.snowflake import SnowflakeConnectionManager
 from dbt.adapters.snowflake import SnowflakeRelation
 from dbt.adapters.snowflake import SnowflakeColumn
 from dbt.contracts.graph.manifest import Manifest
 from dbt.exceptions import RuntimeException
-from dbt.utils import filter_null_values
+from dbt.logger import GLOBAL_LOGGER as logger
+
+
+# note that this isn't an adapter macro, so just a single underscore
+GET_COLUMNS_IN_RELATIONS_MACRO_NAME = 'snowflake_get_columns_in_relations'
+# the same query snowflake__get_columns_in_relation renders
+COLUMNS_IN_RELATION_SQL = """
+select
+    column_name,
+    data_type,
+    character_maximum_length,
+    numeric_precision,
+    numeric_scale
+
+from {information_schema}
+
+where {filters}
+order by ordinal_position
+"""
+# `show columns` reports some types by their internal names
+SHOW_COLUMNS_TYPES = {'FIXED': 'NUMBER', 'REAL': 'FLOAT'}
+# the maximum number of relations whose columns are remembered at once
+COLUMNS_CACHE_MAX_SIZE = 1024
+
+ColumnsCacheKey = Tuple[str, str, str]
 
 
 class SnowflakeAdapter(SQLAdapter):
@@ -21,6 +50,27 @@ class SnowflakeAdapter(SQLAdapter):
          "copy_grants", "snowflake_warehouse"}
     )
 
+    def __init__(self, config):
+        super().__init__(config)
+        # Relation columns, in least-recently-used order. Entries are
+        # invalidated by the adapter methods that change a relation. DDL that
+        # macros send through `statement` or `run_query` is not seen here, so
+        # a relation altered that way keeps its old columns until dbt next
+        # adds, drops or renames it. Nothing is cached with --bypass-cache.
+        self._columns_cache: \
+            'OrderedDict[ColumnsCacheKey, List[SnowflakeColumn]]' = \
+            OrderedDict()
+        self._columns_cache_lock = threading.RLock()
+        # the quoting config can't change for the life of the adapter, so
+        # decide once which parts of a relation path are matched in uppercase
+        quoting = self.config.quoting
+        self._upper_identifier = quoting['identifier'] is False
+        self._upper_schema = quoting['schema'] is False
+        self._upper_database = quoting['database'] is False
+        # the warehouse each snowflake session is using, by session id, as of
+        # the last time dbt checked or changed it
+        self._session_warehouses: Dict[Any, str] = {}
+
     @classmethod
     def date_function(cls):
         return "CURRENT_TIMESTAMP()"
@@ -30,28 +80,270 @@ class SnowflakeAdapter(SQLAdapter):
         cls, table: agate.Table, manifest: Manifest
     ) -> agate.Table:
         # On snowflake, users can set QUOTED_IDENTIFIERS_IGNORE_CASE, so force
-        # the column names to their lowercased forms.
-        lowered = table.rename(
-            column_names=[c.lower() for c in table.column_names]
-        )
-        return super()._catalog_filter_table(lowered, manifest)
+        # the column names to their lowercased forms. Renaming rebuilds (and
+        # re-casts) every row of the catalog, so only do it when some name
+        # actually changes - usually the quoted aliases are already lowercase.
+        lowered_names = tuple(c.lower() for c in table.column_names)
+        if lowered_names != table.column_names:
+            table = table.rename(column_names=lowered_names)
+        return super()._catalog_filter_table(table, manifest)
 
     def _make_match_kwargs(self, database, schema, identifier):
-        quoting = self.config.quoting
-        if identifier is not None and quoting["identifier"] is False:
-            identifier = identifier.upper()
+        # build the filtered dict directly, checking each part for None once
+        kwargs = {}
+        if identifier is not None:
+            if self._upper_identifier:
+                identifier = identifier.upper()
+            kwargs["identifier"] = identifier
+
+        if schema is not None:
+            if self._upper_schema:
+                schema = schema.upper()
+            kwargs["schema"] = schema
+
+        if database is not None:
+            if self._upper_database:
+                database = database.upper()
+            kwargs["database"] = database
+
+        return kwargs
+
+    @staticmethod
+    def _columns_cache_key(relation: SnowflakeRelation) -> ColumnsCacheKey:
+        return (
+            (relation.database or '').lower(),
+            (relation.schema or '').lower(),
+            (relation.identifier or '').lower(),
+        )
+
+    def _get_cached_columns(
+        self, relation: SnowflakeRelation
+    ) -> Optional[List[SnowflakeColumn]]:
+        if not dbt.flags.USE_CACHE:
+            return None
+        key = self._columns_cache_key(relation)
+        with self._columns_cache_lock:
+            columns = self._columns_cache.get(key)
+            if columns is None:
+                return None
+            self._columns_cache.move_to_end(key)
+            return list(columns)
+
+    def _cache_columns(
+        self, relation: SnowflakeRelation, columns: List[SnowflakeColumn]
+    ) -> None:
+        # don't remember relations that don't exist (yet), they may still be
+        # created by a statement dbt doesn't see
+        if not columns or not dbt.flags.USE_CACHE:
+            return
+        key = self._columns_cache_key(relation)
+        with self._columns_cache_lock:
+            self._columns_cache[key] = list(columns)
+            self._columns_cache.move_to_end(key)
+            while len(self._columns_cache) > COLUMNS_CACHE_MAX_SIZE:
+                self._columns_cache.popitem(last=False)
+
+    def _invalidate_columns_cache(
+        self, relation: Optional[SnowflakeRelation]
+    ) -> None:
+        if relation is None:
+            return
+        with self._columns_cache_lock:
+            self._columns_cache.pop(self._columns_cache_key(relation), None)
+
+    def set_relations_cache(
+        self, manifest: Manifest, clear: bool = False
+    ) -> None:
+        with self._columns_cache_lock:
+            self._columns_cache.clear()
+        super().set_relations_cache(manifest, clear=clear)
+
+    def cache_added(self, relation: Optional[SnowflakeRelation]) -> str:
+        self._invalidate_columns_cache(relation)
+        return super().cache_added(relation)
+
+    def cache_dropped(self, relation: Optional[SnowflakeRelation]) -> str:
+        self._invalidate_columns_cache(relation)
+        return super().cache_dropped(relation)
 
-        if schema is not None and quoting["schema"] is False:
-            schema = schema.upper()
+    def cache_renamed(
+        self,
+        from_relation: Optional[SnowflakeRelation],
+        to_relation: Optional[SnowflakeRelation],
+    ) -> str:
+        self._invalidate_columns_cache(from_relation)
+        self._invalidate_columns_cache(to_relation)
+        return super().cache_renamed(from_relation, to_relation)
 
-        if database is not None and quoting["database"] is False:
-            database = database.upper()
+    def alter_column_type(
+        self, relation, column_name, new_column_type
+    ) -> None:
+        self._invalidate_columns_cache(relation)
+        super().alter_column_type(relation, column_name, new_column_type)
+
+    def get_missing_columns(self, from_relation, to_relation):
+        missing = super().get_missing_columns(from_relation, to_relation)
+        # the snapshot materialization adds these columns to to_relation next,
+        # with a statement dbt doesn't see
+        if missing:
+            self._invalidate_columns_cache(to_relation)
+        return missing
 
-        return filter_null_values(
-            {"identifier": identifier, "schema": schema, "database": database}
+    def _query_columns_in_relation(
+        self, relation: SnowflakeRelation
+    ) -> List[SnowflakeColumn]:
+        """Run snowflake__get_columns_in_relation's query without rendering
+        the macro. execute_macro looks adapter methods' macros up in the
+        internal manifest, so a project's own version of the macro never
+        applied here anyway.
+        """
+        filters = ["table_name ilike '{}'".format(relation.identifier)]
+        if relation.schema:
+            filters.append("table_schema ilike '{}'".format(relation.schema))
+        if relation.database:
+            filters.append(
+                "table_catalog ilike '{}'".format(relation.database)
+            )
+        sql = COLUMNS_IN_RELATION_SQL.format(
+            information_schema=relation.information_schema('columns'),
+            filters='\n  and '.join(filters),
         )
+        _, table = self.execute(sql, auto_begin=True, fetch=True)
+        return [self.Column(*row) for row in table]
+
+    def _show_columns_in_relation(
+        self, relation: SnowflakeRelation
+    ) -> List[SnowflakeColumn]:
+        """Get the columns of the relation from Snowflake's metadata service.
+        Unlike information_schema, this does not need a running warehouse,
+        but it raises an error if the relation does not exist.
+        """
+        sql = 'show columns in table {}'.format(relation.render())
+        _, table = self.execute(sql, auto_begin=True, fetch=True)
+        columns = []
+        for row in table:
+            # data_type is a json object, like:
+            # {"type":"FIXED","precision":38,"scale":0,"nullable":true}
+            data_type = json.loads(row['data_type'])
+            dtype = SHOW_COLUMNS_TYPES.get(
+                data_type['type'], data_type['type']
+            )
+            columns.append(self.Column(
+                row['column_name'],
+                dtype,
+                data_type.get('length'),
+                data_type.get('precision'),
+                data_type.get('scale'),
+            ))
+        return columns
+
+    def get_columns_in_relation(self, relation):
+        columns = self._get_cached_columns(relation)
+        if columns is None:
+            if self.config.credentials.show_columns:
+                columns = self._show_columns_in_relation(relation)
+            else:
+                columns = self._query_columns_in_relation(relation)
+            self._cache_columns(relation, columns)
+        return columns
+
+    @available.parse(lambda *a, **k: {})
+    def get_columns_in_relations(
+        self, relations: List[SnowflakeRelation]
+    ) -> Dict[SnowflakeRelation, List[SnowflakeColumn]]:
+        """Get the columns of every given relation with a single query,
+        instead of one query per relation. information_schema is per database
+        on snowflake, so relations in different databases are looked up in
+        separate branches of a `union all`. Relations whose columns are
+        already cached are not queried at all. With `show_columns` set in the
+        profile, each uncached relation gets its own `show columns` instead.
+        """
+        result: Dict[SnowflakeRelation, List[SnowflakeColumn]] = {}
+        by_database: Dict[Optional[str], List[SnowflakeRelation]] = {}
+        for relation in relations:
+            cached = self._get_cached_columns(relation)
+            if cached is not None:
+                result[relation] = cached
+            elif (self.config.credentials.show_columns or
+                  relation.schema is None or relation.identifier is None):
+                # `show columns` takes one relation at a time, and the batched
+                # query matches on (schema, name) pairs, so leave partial
+                # paths to the single-relation lookup
+                result[relation] = self.get_columns_in_relation(relation)
+            else:
+                by_database.setdefault(relation.database, []).append(relation)
+
+        found: Dict[Tuple[Optional[str], str, str], List[SnowflakeColumn]] = {}
+        # Run this on this thread's connection. Temporary tables are only
+        # visible to the session that created them, so the lookup can't be
+        # fanned out over other pooled connections.
+        if by_database:
+            groups = list(by_database.items())
+            table = self.execute_macro(
+                GET_COLUMNS_IN_RELATIONS_MACRO_NAME,
+                kwargs={'relation_groups': [
+                    (group[0].information_schema('columns'), group)
+                    for _, group in groups
+                ]}
+            )
+            # each row is tagged with the index of the group it came from
+            for index, schema, identifier, _, *column in table:
+                database = groups[int(index)][0]
+                key = (database, schema.upper(), identifier.upper())
+                found.setdefault(key, []).append(self.Column(*column))
+
+        for relation in relations:
+            if relation in result:
+                continue
+            columns = found.get((
+                relation.database,
+                relation.schema.upper(),
+                relation.identifier.upper(),
+            ), [])
+            self._cache_columns(relation, columns)
+            result[relation] = columns
+        return result
+
+    def expand_column_types(self, goal, current):
+        # a relation can't need expanding to match itself. (A relation missing
+        # from the relations cache proves nothing, though: temporary tables
+        # created by statements are never added to it.)
+        if goal == current:
+            return
+
+        columns = self.get_columns_in_relations([goal, current])
+        # only string columns can be expanded, and their size is all that is
+        # compared, so that is all that needs to be kept for the target side
+        target_sizes = {
+            c.name: c.string_size() for c in columns[current] if c.is_string()
+        }
+
+        # walk the goal columns once, with a single lookup each
+        for reference_column in columns[goal]:
+            target_size = target_sizes.get(reference_column.name)
+            if target_size is None or not reference_column.is_string():
+                continue
+
+            col_string_size = reference_column.string_size()
+            if col_string_size > target_size:
+                new_type = self.Column.string_type(col_string_size)
+                logger.debug("Changing col type from {} to {} in table {}",
+                             self.Column.string_type(target_size), new_type,
+                             current)
+
+                self.alter_column_type(
+                    current, reference_column.name, new_type
+                )
+
+    def _session_id(self) -> Any:
+        return self.connections.get_thread_connection().handle.session_id
 
     def _get_warehouse(self) -> str:
+        session_id = self._session_id()
+        warehouse = self._session_warehouses.get(session_id)
+        if warehouse is not None:
+            return warehouse
+
         _, table = self.execute(
             'select current_warehouse() as warehouse',
             fetch=True
@@ -61,11 +353,14 @@ class SnowflakeAdapter(SQLAdapter):
             raise RuntimeException(
                 'Could not get current warehouse: no results'
             )
-        return str(table[0][0])
+        warehouse = str(table[0][0])
+        self._session_warehouses[session_id] = warehouse
+        return warehouse
 
     def _use_warehouse(self, warehouse: str):
         """Use the given warehouse. Quotes are never applied."""
         self.execute('use warehouse {}'.format(warehouse))
+        self._session_warehouses[self._session_id()] = warehouse
 
     def pre_model_hook(self, config: Mapping[str, Any]) -> Optional[str]:
         default_warehouse = self.config.credentials.warehouse
@@ -73,11 +368,14 @@ class SnowflakeAdapter(SQLAdapter):
         if warehouse == default_warehouse or warehouse is None:
             return None
         previous = self._get_warehouse()
+        if warehouse == previous:
+            # already there, so there is nothing to switch back to either
+            return None
         self._use_warehouse(warehouse)
         return previous
 
     def post_model_hook(
         self, config: Mapping[str, Any], context: Optional[str]
     ) -> None:
-        if context is not None:
+        if context is not None and context != self._get_warehouse():
             self._use_warehouse(context)
@@ -80,6 +80,40 @@
 {% endmacro %}
 
 
+{% macro snowflake_get_columns_in_relations(relation_groups) -%}
+  {#-- relation_groups is a list of (information_schema, relations) pairs --#}
+  {% call statement('get_columns_in_relations', fetch_result=True) %}
+    {%- for information_schema, relations in relation_groups %}
+      select
+          {{ loop.index0 }} as relation_group,
+          table_schema,
+          table_name,
+          ordinal_position,
+          column_name,
+          data_type,
+          character_maximum_length,
+          numeric_precision,
+          numeric_scale
+
+      from
+      {{ information_schema }}
+
+      where (upper(table_schema), upper(table_name)) in (
+        {%- for relation in relations %}
+        (upper('{{ relation.schema }}'), upper('{{ relation.identifier }}')){% if not loop.last %},{% endif %}
+        {%- endfor %}
+      )
+      {% if not loop.last %}union all{% endif %}
+    {%- endfor %}
+      order by relation_group, table_schema, table_name, ordinal_position
+
+  {% endcall %}
+
+  {{ return(load_result('get_columns_in_relations').table) }}
+
+{% endmacro %}
+
+
 {% macro snowflake__list_relations_without_caching(information_schema, schema) %}
   {% call statement('list_relations_without_caching', fetch_result=True) -%}
     select
@@ -2,6 +2,8 @@ import unittest
 from contextlib import contextmanager
 from unittest import mock
 
+import agate
+
 import dbt.flags as flags
 
 from dbt.adapters.snowflake import SnowflakeAdapter
@@ -13,6 +15,13 @@ from snowflake import connector as snowflake_connector
 from .utils import config_from_parts_or_dicts, inject_adapter, mock_connection
 
 
+COLUMNS_IN_RELATIONS = [
+    'relation_group', 'table_schema', 'table_name', 'ordinal_position',
+    'column_name', 'data_type', 'character_maximum_length',
+    'numeric_precision', 'numeric_scale',
+]
+
+
 class TestSnowflakeAdapter(unittest.TestCase):
     def setUp(self):
         flags.STRICT_MODE = False
@@ -50,10 +59,13 @@ class TestSnowflakeAdapter(unittest.TestCase):
         self.cursor = self.handle.cursor.return_value
         self.mock_execute = self.cursor.execute
         self.patcher = mock.patch(
-            'dbt.adapters.snowflake.connections.snowflake.connector.connect'
+            'snowflake.connector.connect'
         )
         self.snowflake = self.patcher.start()
 
+        self.cache_patch = mock.patch.object(flags, 'USE_CACHE', True)
+        self.cache_patch.start()
+
         self.load_patch = mock.patch('dbt.parser.manifest.make_parse_result')
         self.mock_parse_result = self.load_patch.start()
         self.mock_parse_result.return_value = ParseResult.rpc()
@@ -76,6 +88,7 @@ class TestSnowflakeAdapter(unittest.TestCase):
         self.qh_patch.stop()
         self.patcher.stop()
         self.load_patch.stop()
+        self.cache_patch.stop()
 
     def test_quoting_on_drop_schema(self):
         self.adapter.drop_schema(
@@ -195,6 +208,35 @@ class TestSnowflakeAdapter(unittest.TestCase):
             calls.append(mock.call('/* dbt */\nuse warehouse warehouse', None))
             self.mock_execute.assert_has_calls(calls)
 
+    def test_pre_post_hooks_warehouse_queried_once(self):
+        with self.current_warehouse('warehouse'):
+            config = {'snowflake_warehouse': 'other_warehouse'}
+            for _ in range(2):
+                result = self.adapter.pre_model_hook(config)
+                self.assertEqual(result, 'warehouse')
+                self.adapter.post_model_hook(config, result)
+
+            queries = [c[0][0] for c in self._strip_transactions()]
+            self.assertEqual(queries, [
+                '/* dbt */\nselect current_warehouse() as warehouse',
+                '/* dbt */\nuse warehouse other_warehouse',
+                '/* dbt */\nuse warehouse warehouse',
+                '/* dbt */\nuse warehouse other_warehouse',
+                '/* dbt */\nuse warehouse warehouse',
+            ])
+
+    def test_pre_post_hooks_already_on_warehouse(self):
+        with self.current_warehouse('other_warehouse'):
+            config = {'snowflake_warehouse': 'other_warehouse'}
+            result = self.adapter.pre_model_hook(config)
+            self.assertIsNone(result)
+            self.adapter.post_model_hook(config, result)
+
+            queries = [c[0][0] for c in self._strip_transactions()]
+            self.assertEqual(queries, [
+                '/* dbt */\nselect current_warehouse() as warehouse',
+            ])
+
     def test_pre_post_hooks_no_warehouse(self):
         with self.current_warehouse('warehouse'):
             config = {}
@@ -204,6 +246,276 @@ class TestSnowflakeAdapter(unittest.TestCase):
             self.adapter.post_model_hook(config, result)
             self.mock_execute.assert_not_called()
 
+    def _relation(self, identifier, database='test_database'):
+        return self.adapter.Relation.create(
+            database=database,
+            schema='test_schema',
+            identifier=identifier,
+            type='table',
+            quote_policy=self.adapter.config.quoting,
+        )
+
+    def test_get_columns_in_relations_batched(self):
+        relation_a = self._relation('table_a')
+        relation_b = self._relation('table_b')
+        relation_c = self._relation('table_c', database='other_database')
+        table = agate.Table([
+            [0, 'TEST_SCHEMA', 'TABLE_A', 1, 'ID', 'NUMBER', None, 38, 0],
+            [0, 'TEST_SCHEMA', 'TABLE_A', 2, 'NAME', 'TEXT', 16, None, None],
+            [0, 'TEST_SCHEMA', 'TABLE_B', 1, 'ID', 'NUMBER', None, 38, 0],
+        ], COLUMNS_IN_RELATIONS)
+        with mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            execute_macro.return_value = table
+            result = self.adapter.get_columns_in_relations(
+                [relation_a, relation_b, relation_c]
+            )
+
+        # one query in total, with a group per database
+        self.assertEqual(execute_macro.call_count, 1)
+        groups = execute_macro.call_args[1]['kwargs']['relation_groups']
+        self.assertEqual(
+            [relations for _, relations in groups],
+            [[relation_a, relation_b], [relation_c]]
+        )
+        self.assertEqual(
+            [c.name for c in result[relation_a]], ['ID', 'NAME']
+        )
+        self.assertEqual(result[relation_a][1].data_type, 'character varying(16)')
+        self.assertEqual([c.name for c in result[relation_b]], ['ID'])
+        self.assertEqual(result[relation_c], [])
+
+    def test_get_columns_in_relations_without_schema(self):
+        relation = self.adapter.Relation.create(
+            database='test_database',
+            schema=None,
+            identifier='table_a',
+            type='table',
+            quote_policy=self.adapter.config.quoting,
+        )
+        columns = [self.adapter.Column('ID', 'NUMBER', None, 38, 0)]
+        with mock.patch.object(self.adapter, 'get_columns_in_relation') as get_columns, \
+                mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            get_columns.return_value = columns
+            result = self.adapter.get_columns_in_relations([relation])
+
+        execute_macro.assert_not_called()
+        get_columns.assert_called_once_with(relation)
+        self.assertEqual(result, {relation: columns})
+
+    def test_get_columns_in_relations_show_columns(self):
+        self.config.credentials = self.config.credentials.replace(
+            show_columns=True
+        )
+        relation_a = self._relation('table_a')
+        relation_b = self._relation('table_b')
+        columns = [self.adapter.Column('ID', 'NUMBER', None, 38, 0)]
+        with mock.patch.object(self.adapter, '_show_columns_in_relation') as show_columns, \
+                mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            show_columns.return_value = columns
+            result = self.adapter.get_columns_in_relations(
+                [relation_a, relation_b]
+            )
+            # both were cached
+            self.adapter.get_columns_in_relations([relation_a, relation_b])
+
+        execute_macro.assert_not_called()
+        show_columns.assert_has_calls([
+            mock.call(relation_a), mock.call(relation_b)
+        ])
+        self.assertEqual(show_columns.call_count, 2)
+        self.assertEqual(result, {relation_a: columns, relation_b: columns})
+
+    def test_expand_column_types_single_query(self):
+        goal = self._relation('goal')
+        current = self._relation('current')
+        table = agate.Table([
+            [0, 'TEST_SCHEMA', 'GOAL', 1, 'ID', 'NUMBER', None, 38, 0],
+            [0, 'TEST_SCHEMA', 'GOAL', 2, 'NAME', 'TEXT', 32, None, None],
+            [0, 'TEST_SCHEMA', 'GOAL', 3, 'CODE', 'TEXT', 8, None, None],
+            [0, 'TEST_SCHEMA', 'CURRENT', 1, 'ID', 'NUMBER', None, 38, 0],
+            [0, 'TEST_SCHEMA', 'CURRENT', 2, 'NAME', 'TEXT', 16, None, None],
+            [0, 'TEST_SCHEMA', 'CURRENT', 3, 'CODE', 'TEXT', 8, None, None],
+        ], COLUMNS_IN_RELATIONS)
+        with mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            execute_macro.return_value = table
+            self.adapter.expand_column_types(goal, current)
+
+        self.assertEqual(execute_macro.call_count, 2)
+        get_columns_call, alter_call = execute_macro.call_args_list
+        self.assertEqual(
+            get_columns_call[1]['kwargs']['relation_groups'][0][1],
+            [goal, current]
+        )
+        self.assertEqual(alter_call[1]['kwargs']['column_name'], 'NAME')
+        self.assertEqual(
+            alter_call[1]['kwargs']['new_column_type'],
+            'character varying(32)'
+        )
+
+    def test_expand_column_types_same_relation(self):
+        relation = self._relation('table_a')
+        with mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            self.adapter.expand_column_types(relation, self._relation('table_a'))
+        execute_macro.assert_not_called()
+
+    def test_get_columns_in_relation_cached(self):
+        relation = self._relation('table_a')
+        columns = [self.adapter.Column('ID', 'NUMBER', None, 38, 0)]
+        with mock.patch.object(self.adapter, '_query_columns_in_relation') as query, \
+                mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            query.return_value = columns
+            self.assertEqual(
+                self.adapter.get_columns_in_relation(relation), columns
+            )
+            self.assertEqual(
+                self.adapter.get_columns_in_relation(relation), columns
+            )
+            self.assertEqual(query.call_count, 1)
+            # the batched lookup is served from the cache too
+            self.assertEqual(
+                self.adapter.get_columns_in_relations([relation]),
+                {relation: columns}
+            )
+            execute_macro.assert_not_called()
+
+            self.adapter.drop_relation(relation)
+            self.adapter.get_columns_in_relation(relation)
+
+        self.assertEqual(query.call_count, 2)
+
+    def test_get_columns_in_relation_bypass_cache(self):
+        flags.USE_CACHE = False
+        relation = self._relation('table_a')
+        columns = [self.adapter.Column('ID', 'NUMBER', None, 38, 0)]
+        with mock.patch.object(self.adapter, '_query_columns_in_relation') as query:
+            query.return_value = columns
+            self.adapter.get_columns_in_relation(relation)
+            self.adapter.get_columns_in_relation(relation)
+        self.assertEqual(query.call_count, 2)
+
+        table = agate.Table([
+            [0, 'TEST_SCHEMA', 'TABLE_A', 1, 'ID', 'NUMBER', None, 38, 0],
+        ], COLUMNS_IN_RELATIONS)
+        with mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            execute_macro.return_value = table
+            self.adapter.get_columns_in_relations([relation])
+            self.adapter.get_columns_in_relations([relation])
+        self.assertEqual(execute_macro.call_count, 2)
+
+    def test_get_missing_columns_invalidates_target(self):
+        source = self._relation('source')
+        target = self._relation('target')
+        source_columns = [
+            self.adapter.Column('ID', 'NUMBER', None, 38, 0),
+            self.adapter.Column('NAME', 'TEXT', 16, None, None),
+        ]
+        target_columns = source_columns[:1]
+
+        def get_columns(relation):
+            if relation == source:
+                return source_columns
+            return target_columns
+
+        with mock.patch.object(self.adapter, '_query_columns_in_relation') as query:
+            query.side_effect = get_columns
+            missing = self.adapter.get_missing_columns(source, target)
+            self.assertEqual([c.name for c in missing], ['NAME'])
+
+            # the caller adds the missing columns, so they must be re-read
+            target_columns = source_columns
+            self.assertEqual(
+                [c.name for c in self.adapter.get_columns_in_relation(target)],
+                ['ID', 'NAME']
+            )
+
+    def test_get_columns_in_relation_missing_not_cached(self):
+        relation = self._relation('table_a')
+        with mock.patch.object(self.adapter, '_query_columns_in_relation') as query:
+            query.return_value = []
+            self.adapter.get_columns_in_relation(relation)
+            self.adapter.get_columns_in_relation(relation)
+        self.assertEqual(query.call_count, 2)
+
+    def test_catalog_filter_table_lowercases_names(self):
+        manifest = mock.MagicMock()
+        manifest.get_used_schemas.return_value = {('DBT', 'ANALYTICS')}
+        table = agate.Table(
+            [['dbt', 'analytics', 'a'], ['dbt', 'other', 'b']],
+            ['TABLE_DATABASE', 'table_schema', 'table_name'],
+        )
+        result = self.adapter._catalog_filter_table(table, manifest)
+        self.assertEqual(
+            result.column_names,
+            ('table_database', 'table_schema', 'table_name')
+        )
+        self.assertEqual(len(result), 1)
+
+        # already-lowercased tables are filtered without being renamed
+        with mock.patch.object(agate.Table, 'rename') as rename:
+            result = self.adapter._catalog_filter_table(result, manifest)
+        rename.assert_not_called()
+        self.assertEqual(len(result), 1)
+
+    def test_make_match_kwargs(self):
+        self.assertEqual(
+            self.adapter._make_match_kwargs('db', 'schema', 'table'),
+            {'database': 'DB', 'schema': 'schema', 'identifier': 'TABLE'}
+        )
+        self.assertEqual(
+            self.adapter._make_match_kwargs(None, 'schema', None),
+            {'schema': 'schema'}
+        )
+
+    def test_get_columns_in_relation_without_macro(self):
+        relation = self._relation('table_a')
+        self.cursor.description = [
+            ['column_name'], ['data_type'], ['character_maximum_length'],
+            ['numeric_precision'], ['numeric_scale'],
+        ]
+        self.cursor.fetchall.return_value = [
+            ['ID', 'NUMBER', None, 38, 0],
+        ]
+        with mock.patch.object(self.adapter, 'execute_macro') as execute_macro:
+            columns = self.adapter.get_columns_in_relation(relation)
+
+        execute_macro.assert_not_called()
+        self.assertEqual([c.name for c in columns], ['ID'])
+        sql = self._strip_transactions()[-1][0][0]
+        self.assertIn('from test_database.INFORMATION_SCHEMA.columns', sql)
+        self.assertIn("where table_name ilike 'table_a'", sql)
+        self.assertIn("and table_schema ilike 'test_schema'", sql)
+        self.assertIn("and table_catalog ilike 'test_database'", sql)
+
+    def test_get_columns_in_relation_show_columns(self):
+        self.config.credentials = self.config.credentials.replace(
+            show_columns=True
+        )
+        relation = self._relation('table_a')
+        self.cursor.description = [
+            ['table_name'], ['schema_name'], ['column_name'], ['data_type'],
+        ]
+        self.cursor.fetchall.return_value = [
+            ['TABLE_A', 'TEST_SCHEMA', 'ID',
+             '{"type":"FIXED","precision":38,"scale":0,"nullable":true}'],
+            ['TABLE_A', 'TEST_SCHEMA', 'NAME',
+             '{"type":"TEXT","length":16,"byteLength":64,"nullable":true}'],
+            ['TABLE_A', 'TEST_SCHEMA', 'SCORE',
+             '{"type":"REAL","nullable":true}'],
+        ]
+        columns = self.adapter.get_columns_in_relation(relation)
+
+        self.assertEqual(
+            [(c.name, c.data_type) for c in columns],
+            [('ID', 'NUMBER(38,0)'),
+             ('NAME', 'character varying(16)'),
+             ('SCORE', 'FLOAT')]
+        )
+        sql = self._strip_transactions()[-1][0][0]
+        self.assertEqual(
+            sql,
+            '/* dbt */\nshow columns in table test_database."test_schema".table_a'
+        )
+
     def test_cancel_open_connections_empty(self):
         self.assertEqual(len(list(self.adapter.cancel_open_connections())), 0)
 